@@ -4,9 +4,11 @@ import (
 	"database/sql"
 	"encoding/json" // Added for JSON handling
 	"fmt"
+	"io"
 	"log"
 	"net/http"
 	"strconv"
+	"strings"
 
 	_ "github.com/mattn/go-sqlite3"
 )
@@ -110,8 +112,13 @@ func handleGetUsers(db *sql.DB) http.HandlerFunc {
 		}
 		defer rows.Close()
 
+		// Buffer the whole response and write it once, rather than issuing a
+		// small ResponseWriter write per row. This also means errors found
+		// mid-iteration can still produce a clean error status, since nothing
+		// has been flushed to the client yet.
 		// Consider returning JSON array
-		fmt.Fprintf(w, "Users:\n")
+		var sb strings.Builder
+		sb.WriteString("Users:\n")
 		for rows.Next() {
 			var u User
 			err := rows.Scan(&u.ID, &u.Name, &u.Email, &u.Age)
@@ -121,11 +128,15 @@ func handleGetUsers(db *sql.DB) http.HandlerFunc {
 				http.Error(w, "Error scanning user data", http.StatusInternalServerError)
 				return
 			}
-			fmt.Fprintf(w, "ID: %d, Name: %s, Email: %s, Age: %d\n", u.ID, u.Name, u.Email, u.Age)
+			fmt.Fprintf(&sb, "ID: %d, Name: %s, Email: %s, Age: %d\n", u.ID, u.Name, u.Email, u.Age)
 		}
 		if err := rows.Err(); err != nil {
 			log.Printf("Error iterating all users rows: %v", err)
 			http.Error(w, "Error iterating user data", http.StatusInternalServerError)
+			return
+		}
+		if _, err := io.WriteString(w, sb.String()); err != nil {
+			log.Printf("Error writing users response: %v", err)
 		}
 	}
 }
@@ -1,6 +1,7 @@
 package main
 
 import (
+	"bufio"
 	"context"
 	"encoding/json"
 	"fmt"
@@ -196,11 +197,19 @@ func writeUsersToJSON(users []User, filePath string) error {
 	}
 	defer file.Close()
 
-	encoder := json.NewEncoder(file)
+	// Buffer writes so the encoder hands the OS large contiguous chunks
+	// instead of many small write syscalls (same pattern as datarizer's
+	// JSONL writer).
+	bw := bufio.NewWriter(file)
+
+	encoder := json.NewEncoder(bw)
 	encoder.SetIndent("", "  ") // Optional: for pretty printing
 	if err := encoder.Encode(users); err != nil {
 		return fmt.Errorf("failed to encode users to JSON file '%s': %w", filePath, err)
 	}
+	if err := bw.Flush(); err != nil {
+		return fmt.Errorf("failed to flush JSON file '%s': %w", filePath, err)
+	}
 	log.Printf("Successfully wrote %d users to JSON file: %s\n", len(users), filePath)
 	return nil
 }
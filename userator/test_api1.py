@@ -6,19 +6,21 @@ from fastapi.testclient import TestClient  # Import TestClient
 # Assuming your FastAPI app and Pydantic models are in api_1.py
 # You might need to adjust the import path if your project structure is different
 # For example, if gogogo is a package: from gogogo.api_1 import app, UserCreate, UserResponse, get_db_connection
-from api_1 import app, UserCreate, UserResponse, get_db_connection, DATABASE_URL
+from api_1 import app, UserCreate, UserResponse, get_read_db, get_write_db
 
 # --- Test Database Setup ---
 # We'll use an in-memory SQLite database for tests.
 # The tables will be created for each test function that uses the 'test_db' fixture.
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="module")
 def test_db_conn():
     """
-    Fixture to set up an in-memory SQLite database for a single test function.
+    Fixture to set up an in-memory SQLite database shared by the module.
     Creates tables and yields a connection. Closes connection afterwards.
     Disables thread checking for test environment compatibility with FastAPI's TestClient.
+    Per-test isolation is handled by the autouse clean_users_table fixture,
+    which is much cheaper than rebuilding the DB for every test.
     """
     # Using ":memory:" creates a fresh DB for each connection in sqlite3 by default.
     # Add check_same_thread=False to allow the connection to be used across
@@ -38,30 +40,48 @@ def test_db_conn():
         )
     """
     )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
     conn.commit()
     yield conn  # Provide the connection to the test
     conn.close()
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="module")
 def client(test_db_conn: sqlite3.Connection):
     """
-    Fixture to provide a TestClient with the get_db_connection dependency overridden.
+    Fixture to provide a TestClient with the read/write db dependencies overridden.
+    Module-scoped so the lifespan handler (connection pools, PRAGMAs) runs once
+    per module instead of once per test.
+    Both point at the same in-memory connection; the read/write split only
+    matters for the on-disk database in production.
     """
 
-    def override_get_db_connection():
+    def override_get_db():
         try:
             yield test_db_conn  # Use the connection from the test_db_conn fixture
         finally:
             # The test_db_conn fixture is responsible for closing the connection
             pass
 
-    app.dependency_overrides[get_db_connection] = override_get_db_connection
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_write_db] = override_get_db
     # Use TestClient for FastAPI testing
     with TestClient(app) as c:  # Changed from TestClient
         yield c
     # Clean up dependency overrides
-    del app.dependency_overrides[get_db_connection]
+    del app.dependency_overrides[get_read_db]
+    del app.dependency_overrides[get_write_db]
+
+
+@pytest.fixture(autouse=True)
+def clean_users_table(test_db_conn: sqlite3.Connection):
+    """
+    Wipes the users table (and resets its AUTOINCREMENT counter) before each
+    test, keeping tests isolated despite the module-scoped connection.
+    """
+    test_db_conn.execute("DELETE FROM users")
+    test_db_conn.execute("DELETE FROM sqlite_sequence WHERE name='users'")
+    test_db_conn.commit()
 
 
 # --- Test Cases ---
@@ -160,23 +180,67 @@ def test_add_user_negative_age(client: TestClient):
     )
 
 
+# Tests for Bulk Add (POST /users/bulk)
+def test_add_users_bulk_positive(client: TestClient, test_db_conn: sqlite3.Connection):
+    """Positive case - all users inserted in one transaction"""
+    users_data = [
+        {"name": "Bulk One", "email": "bulk1@example.com", "age": 21},
+        {"name": "Bulk Two", "email": "bulk2@example.com", "age": 22},
+        {"name": "Bulk Three", "email": "bulk3@example.com", "age": 23},
+    ]
+    response = client.post("/users/bulk", json=users_data)
+
+    assert response.status_code == 201, response.text
+    assert response.json() == {"inserted": len(users_data)}
+
+    cursor = test_db_conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users")
+    assert cursor.fetchone()[0] == len(users_data)
+
+
+def test_add_users_bulk_duplicate_rolls_back_all(
+    client: TestClient, test_db_conn: sqlite3.Connection
+):
+    """Negative case - one duplicate email rolls back the whole batch"""
+    client.post(
+        "/users/", json={"name": "Existing", "email": "taken@example.com", "age": 40}
+    )
+    users_data = [
+        {"name": "New User", "email": "new@example.com", "age": 30},
+        {"name": "Dup User", "email": "taken@example.com", "age": 31},
+    ]
+    response = client.post("/users/bulk", json=users_data)
+
+    assert response.status_code == 409
+    assert "no users were added" in response.json()["detail"]
+
+    # The non-duplicate user must not have been inserted either
+    cursor = test_db_conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM users WHERE email = ?", ("new@example.com",))
+    assert cursor.fetchone()[0] == 0
+
+
 # Tests for Get Users (GET /users/ and GET /users/{user_id_path})
 def _add_sample_users(db_conn: sqlite3.Connection) -> List[Dict[str, Any]]:
     users_data = [
         {"name": "Alice", "email": "alice@example.com", "age": 28},
         {"name": "Bob", "email": "bob@example.com", "age": 32},
     ]
-    inserted_users = []
     cursor = db_conn.cursor()
-    for user in users_data:
-        cursor.execute(
-            "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
-            (user["name"], user["email"], user["age"]),
-        )
-        user_id = cursor.lastrowid
-        inserted_users.append({**user, "id": user_id})
+    cursor.executemany(
+        "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+        [(u["name"], u["email"], u["age"]) for u in users_data],
+    )
     db_conn.commit()
-    return inserted_users
+    # executemany doesn't expose per-row lastrowid, so recover the assigned
+    # ids in one round trip instead of one query per insert.
+    placeholders = ", ".join("?" for _ in users_data)
+    cursor.execute(
+        f"SELECT id, email FROM users WHERE email IN ({placeholders})",
+        [u["email"] for u in users_data],
+    )
+    ids_by_email = {row["email"]: row["id"] for row in cursor.fetchall()}
+    return [{**u, "id": ids_by_email[u["email"]]} for u in users_data]
 
 
 def test_get_all_users(client: TestClient, test_db_conn: sqlite3.Connection):
@@ -194,6 +258,20 @@ def test_get_all_users(client: TestClient, test_db_conn: sqlite3.Connection):
     assert response_emails == sample_emails
 
 
+def test_get_users_after_id_keyset(client: TestClient, test_db_conn: sqlite3.Connection):
+    """Positive case - keyset pagination returns only users past the cursor"""
+    sample_users = _add_sample_users(test_db_conn)
+    first_user = sample_users[0]  # Alice
+
+    response = client.get(f"/users/?after_id={first_user['id']}")
+    assert response.status_code == 200
+    response_data = response.json()
+    assert [u["email"] for u in response_data] == [
+        u["email"] for u in sample_users[1:]
+    ]
+    assert all(u["id"] > first_user["id"] for u in response_data)
+
+
 def test_get_specific_user_by_id_path(
     client: TestClient, test_db_conn: sqlite3.Connection
 ):
@@ -212,19 +290,18 @@ def test_get_specific_user_by_id_path(
 def test_get_specific_user_by_id_query(
     client: TestClient, test_db_conn: sqlite3.Connection
 ):
-    """Positive case - get specific user by query parameter ID"""
+    """Positive case - query parameter ID redirects to the canonical path"""
     sample_users = _add_sample_users(test_db_conn)
     user_to_get = sample_users[1]  # Get Bob
 
     response = client.get(f"/users/?user_id={user_to_get['id']}")
+    # TestClient follows the 307 to /users/{id}, which returns a bare user
     assert response.status_code == 200
+    assert response.history[0].status_code == 307
     response_data = response.json()
-    assert isinstance(response_data, list)
-    assert len(response_data) == 1
-    user_in_list = response_data[0]
-    assert user_in_list["id"] == user_to_get["id"]
-    assert user_in_list["name"] == user_to_get["name"]
-    assert user_in_list["email"] == user_to_get["email"]
+    assert response_data["id"] == user_to_get["id"]
+    assert response_data["name"] == user_to_get["name"]
+    assert response_data["email"] == user_to_get["email"]
 
 
 def test_get_user_not_found_path(client: TestClient):